@@ -5,26 +5,38 @@ Endpoints:
 - POST /jobs - Create a new download job (single range)
 - POST /jobs/batch - Create a batch job with multiple ranges
 - GET /jobs/<job_id> - Get job status
-- GET /jobs/<job_id>/download.zip - Download completed ZIP archive
+- GET /jobs/<job_id>/download.zip - Download completed ZIP archive (streamed)
 - GET /jobs/<job_id>/download.pdf - Download completed PDF (if available)
 - GET /batch/<batch_id> - Get batch job status (all ranges)
 - GET /batch/<batch_id>/download.pdf - Download combined PDF of all ranges
 """
 
 import os
-import json
-import uuid
-import zipfile
+import atexit
+import copy
+import hashlib
+import itertools
+import time
+import re
+import secrets
+import signal
+import sys
+import queue
 import threading
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from flask import Flask, request, jsonify, send_file, g
+import orjson
+from flask import Flask, Response, request, jsonify, send_file, g
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-from downloader import download_range
+from downloader import download_range, load_checksums
+from zipstream import stream_zip
 
 # Configure logging
 logging.basicConfig(
@@ -33,6 +45,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# PDF output is optional
+from pdfbuild import img2pdf, pikepdf, images_to_pdf, merge_pdfs
+if img2pdf is None:
+    logger.warning("img2pdf not installed - PDF creation is disabled")
+
 app = Flask(__name__)
 
 # ============================================================================
@@ -135,10 +152,75 @@ BATCH_DIR = os.path.join(os.path.dirname(__file__), "jobs", "_batches")
 MAX_PAGES = 800
 MAX_RANGES_PER_BATCH = 10
 
+# Download jobs run on a bounded pool; jobs beyond JOB_WORKERS wait in the
+# queue instead of all downloading from NARA at once.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+# Batch monitors wait on their jobs, so they get their own pool: on the job
+# pool they could occupy every worker and leave their jobs queued forever.
+BATCH_MONITOR_WORKERS = int(os.environ.get("BATCH_MONITOR_WORKERS", "4"))
+MONITOR_EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_MONITOR_WORKERS, thread_name_prefix="batch-monitor")
+
+# PDFs are built in worker processes so conversion does not hold the GIL of
+# the process serving requests. Workers are spawned rather than forked since
+# this process is multithreaded. Under gunicorn they import only pdfbuild;
+# when app.py is run directly, spawn also re-imports it in each worker as
+# __mp_main__ (the server itself is not started there).
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "2"))
+PDF_POOL = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+_pdf_pool_lock = threading.Lock()
+
+# ZIP downloads store JPEGs uncompressed by default. Set ZIP_COMPRESSLEVEL
+# (1-9) to deflate entries instead, using one worker thread per CPU.
+ZIP_COMPRESSLEVEL = os.environ.get("ZIP_COMPRESSLEVEL")
+ZIP_COMPRESSLEVEL = int(ZIP_COMPRESSLEVEL) if ZIP_COMPRESSLEVEL else None
+
+# ============================================================================
+# File Download Configuration
+# ============================================================================
+# Downloads are conditional (ETag / Last-Modified / Range), so retries can
+# resume or get a 304. To have the front proxy send files with sendfile(2)
+# instead of streaming them through Python:
+#   X_ACCEL_REDIRECT_PREFIX=/internal-jobs/ - nginx, with a matching
+#       location /internal-jobs/ { internal; alias /app/jobs/; }
+#   USE_X_SENDFILE=1 - servers that understand X-Sendfile (Apache, lighttpd)
+X_ACCEL_REDIRECT_PREFIX = os.environ.get("X_ACCEL_REDIRECT_PREFIX")
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE") == "1"
+
+
+ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+CATALOG_URL_PATTERN = re.compile(r"^https?://(?:www\.)?catalog\.archives\.gov/id/\d+", re.IGNORECASE)
+
+
+def new_id() -> str:
+    """
+    Generate a 32-character hex ID for a job or batch.
+
+    IDs follow the UUIDv7 layout: a 48-bit millisecond timestamp followed by
+    random bits, so they sort by creation time. The random part is at the
+    end; use the last characters when an ID needs to be shortened.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(secrets.token_bytes(10), "big")
+    value = value & ~(0xF << 76) | (0x7 << 76)  # version 7
+    value = value & ~(0x3 << 62) | (0x2 << 62)  # RFC 4122 variant
+    return f"{value:032x}"
+
+
+def is_valid_id(value: str) -> bool:
+    """Check that an ID from a request looks like one we generated."""
+    return ID_PATTERN.match(value) is not None
+
 
 def get_job_path(job_id: str) -> str:
-    """Get the path to a job folder."""
-    return os.path.join(JOBS_DIR, job_id)
+    """
+    Get the path to a job folder.
+
+    Job folders are sharded two levels deep by the random end of the ID
+    (jobs/yz/wx/...wxyz) so no single directory grows unbounded. The
+    time-ordered start of the ID would put all recent jobs in one shard.
+    """
+    return os.path.join(JOBS_DIR, job_id[-2:], job_id[-4:-2], job_id)
 
 
 def get_status_path(job_id: str) -> str:
@@ -146,67 +228,420 @@ def get_status_path(job_id: str) -> str:
     return os.path.join(get_job_path(job_id), "status.json")
 
 
+def list_images(images_path: str) -> list:
+    """List the downloaded JPEGs in a folder as DirEntry objects, sorted by name."""
+    with os.scandir(images_path) as it:
+        entries = [e for e in it if e.name.endswith(".jpg")]
+    entries.sort(key=lambda e: e.name)
+    return entries
+
+
+def send_job_file(path: str, download_name: str, mimetype: str):
+    """Send a file from the jobs folder as an attachment."""
+    if X_ACCEL_REDIRECT_PREFIX:
+        internal_path = os.path.relpath(path, JOBS_DIR).replace(os.sep, "/")
+        response = Response(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = X_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + internal_path
+        response.headers["Content-Disposition"] = f"attachment; filename={download_name}"
+        return response
+
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mimetype,
+        conditional=True,
+        etag=True,
+        max_age=0,
+        last_modified=os.path.getmtime(path)
+    )
+
+
+# ============================================================================
+# Job Status Store
+# ============================================================================
+# Job status is kept in memory and served from there. status.json is a
+# persisted copy: it is written immediately on state transitions
+# (queued -> running -> completed/failed) and otherwise by a single flusher
+# thread, which writes every job updated since its last pass once every
+# STATUS_FLUSH_INTERVAL seconds. It is only read back for jobs this process
+# has not written itself, e.g. after a restart.
+#
+# Status stays in one file per job folder rather than a shared database:
+# cleanup.py ages and removes jobs by folder, and a job's status, logs and
+# images are deleted together. Polling never touches the disk for jobs this
+# process is running.
+#
+# The periodic progress snapshots of queued and running jobs go to
+# HOT_STATUS_DIR instead, a RAM-backed tmpfs when one is available, so
+# only transitions reach the jobs folder on disk. The snapshot is removed
+# whenever status.json is written, e.g. with the job's final status.
+STATUS_FLUSH_INTERVAL = float(os.environ.get("STATUS_FLUSH_INTERVAL", "0.5"))
+
+# status.json is written compactly; set DEBUG_STATUS=1 to pretty-print it
+STATUS_JSON_OPTIONS = orjson.OPT_INDENT_2 if os.environ.get("DEBUG_STATUS") else 0
+
+ACTIVE_STATUSES = ("queued", "running")
+
+HOT_STATUS_DIR = os.environ.get("HOT_STATUS_DIR", "/dev/shm/nara-jobs")
+try:
+    os.makedirs(HOT_STATUS_DIR, exist_ok=True)
+    if not os.access(HOT_STATUS_DIR, os.W_OK):
+        raise PermissionError(HOT_STATUS_DIR)
+except OSError:
+    logger.info(f"{HOT_STATUS_DIR} is not writable - progress is written to status.json")
+    HOT_STATUS_DIR = None
+
+JOB_STATE: dict[str, dict] = {}
+JOB_LOCK = threading.Lock()
+JOB_VERSIONS: dict[str, int] = {}
+_status_versions = itertools.count(1)
+_dirty_jobs: set[str] = set()
+_status_dirty = threading.Event()
+_flush_lock = threading.Lock()
+
+# Parsed status.json files (jobs and batches) read from disk, keyed by path:
+# (mtime_ns, status). An entry is reused for as long as the file's mtime is
+# unchanged; the oldest entries are dropped beyond STATUS_CACHE_SIZE.
+STATUS_CACHE_SIZE = 1024
+_STATUS_CACHE: dict[str, tuple[int, dict]] = {}
+_STATUS_CACHE_LOCK = threading.Lock()
+
+# Serialized GET /jobs/<id> bodies of in-memory jobs, keyed by job_id:
+# (version, body)
+_status_json_cache: dict[str, tuple[int, bytes]] = {}
+
+
+def write_file_atomic(path: str, data: bytes):
+    """
+    Replace a file's contents atomically.
+
+    The data is written to a temporary file, normally with a single
+    os.write(), and renamed over the target, so readers never see a
+    partially written file. The temporary file is removed if either fails.
+    The temporary name is unique per process and thread so concurrent writers
+    cannot interleave into the same file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Don't leave the temporary file behind in the job folder
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def cache_status(path: str, mtime_ns: int, status: dict):
+    """Store a parsed status file in _STATUS_CACHE. Call with _STATUS_CACHE_LOCK held."""
+    _STATUS_CACHE.pop(path, None)
+    _STATUS_CACHE[path] = (mtime_ns, status)
+    while len(_STATUS_CACHE) > STATUS_CACHE_SIZE:
+        del _STATUS_CACHE[next(iter(_STATUS_CACHE))]
+
+
+def read_json_cached(path: str) -> tuple:
+    """
+    Read a status.json file, reusing the parsed dict while its mtime is unchanged.
+
+    Returns:
+        (status, mtime_ns), or (None, None) if the file does not exist
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        with _STATUS_CACHE_LOCK:
+            _STATUS_CACHE.pop(path, None)
+        return None, None
+
+    with _STATUS_CACHE_LOCK:
+        cached = _STATUS_CACHE.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return copy.copy(cached[1]), mtime_ns
+
+    with open(path, "rb") as f:
+        status = orjson.loads(f.read())
+
+    with _STATUS_CACHE_LOCK:
+        cache_status(path, mtime_ns, status)
+    return copy.copy(status), mtime_ns
+
+
+def update_json_cache(path: str, status: dict):
+    """Cache a status this process just wrote to path, so reading it back skips parsing."""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return
+    with _STATUS_CACHE_LOCK:
+        cache_status(path, mtime_ns, copy.copy(status))
+
+
+def get_hot_status_path(job_id: str) -> str:
+    """Get the path of a job's progress snapshot in HOT_STATUS_DIR."""
+    return os.path.join(HOT_STATUS_DIR, f"{job_id}.json")
+
+
+def flush_status(job_id: str, durable: bool = True):
+    """
+    Persist the in-memory status of a job.
+
+    Args:
+        durable: Write status.json. If False, the status of an active job is
+            written to HOT_STATUS_DIR instead, when one is available.
+    """
+    with _flush_lock:
+        with JOB_LOCK:
+            _dirty_jobs.discard(job_id)
+            status = JOB_STATE.get(job_id)
+            if status is None:
+                return
+            data = orjson.dumps(status, option=STATUS_JSON_OPTIONS)
+        active = status.get("status") in ACTIVE_STATUSES
+        if HOT_STATUS_DIR is not None and active and not durable:
+            write_file_atomic(get_hot_status_path(job_id), data)
+            return
+
+        write_file_atomic(get_status_path(job_id), data)
+        if HOT_STATUS_DIR is not None:
+            # status.json is now the newest copy; drop any older snapshot
+            try:
+                os.remove(get_hot_status_path(job_id))
+            except FileNotFoundError:
+                pass
+
+        # A finished job's status is final once it is on disk, so it is
+        # served from status.json from now on rather than kept in memory
+        # for the life of the process. Reading it back from disk also
+        # makes a job deleted by cleanup.py read as missing.
+        if not active:
+            with JOB_LOCK:
+                if JOB_STATE.get(job_id) is status:
+                    del JOB_STATE[job_id]
+                    JOB_VERSIONS.pop(job_id, None)
+                    _status_json_cache.pop(job_id, None)
+
+
+def _status_flusher():
+    """Persist jobs updated since the last pass, at most once per STATUS_FLUSH_INTERVAL."""
+    while True:
+        _status_dirty.wait()
+        time.sleep(STATUS_FLUSH_INTERVAL)
+        with JOB_LOCK:
+            job_ids = list(_dirty_jobs)
+            _dirty_jobs.clear()
+            _status_dirty.clear()
+        for job_id in job_ids:
+            try:
+                flush_status(job_id, durable=False)
+            except OSError as e:
+                logger.error(f"[Job {job_id[-8:]}] Could not write status: {e}")
+
+
+threading.Thread(target=_status_flusher, name="status-flusher", daemon=True).start()
+
+
+def read_status_versioned(job_id: str) -> tuple:
+    """
+    Read the status of a job along with a version that changes on every update.
+
+    Returns:
+        (status, version), or (None, None) if the job does not exist
+    """
+    if not is_valid_id(job_id):
+        return None, None
+
+    with JOB_LOCK:
+        status = JOB_STATE.get(job_id)
+        if status is not None:
+            return dict(status), JOB_VERSIONS[job_id]
+
+    # Jobs this process has not written (e.g. from before a restart) are read
+    # from disk, preferring a newer progress snapshot; the version is the
+    # file's mtime
+    if HOT_STATUS_DIR is not None:
+        status, version = read_json_cached(get_hot_status_path(job_id))
+        # A snapshot left behind by a process that died mid-job outlives the
+        # job folder if cleanup.py removes it; it is ignored then
+        if status is not None and os.path.isdir(get_job_path(job_id)):
+            return status, version
+    return read_json_cached(get_status_path(job_id))
+
+
 def read_status(job_id: str) -> dict:
-    """Read status.json for a job."""
-    status_path = get_status_path(job_id)
-    if not os.path.exists(status_path):
-        return None
-    with open(status_path, "r") as f:
-        return json.load(f)
+    """Read the status of a job, from memory or status.json on cold start."""
+    return read_status_versioned(job_id)[0]
 
 
 def write_status(job_id: str, status: dict):
-    """Write status.json for a job."""
-    status_path = get_status_path(job_id)
-    with open(status_path, "w") as f:
-        json.dump(status, f, indent=2)
+    """Update the status of a job and schedule it to be persisted."""
+    with JOB_LOCK:
+        previous = JOB_STATE.get(job_id)
+        JOB_STATE[job_id] = dict(status)
+        JOB_VERSIONS[job_id] = next(_status_versions)
+        transition = previous is None or previous.get("status") != status.get("status")
+        if not transition:
+            _dirty_jobs.add(job_id)
+            _status_dirty.set()
+
+    if transition:
+        flush_status(job_id)
+
+
+# Log lines are queued and written by a single background thread. It keeps
+# one O_APPEND descriptor open per running job and writes each batch of
+# lines for a job with a single writev() call.
+LOG_BATCH_SIZE = 64
+LOG_BATCH_WINDOW = 0.1
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_drained = threading.Event()
+
+
+def _log_writer():
+    """Drain the log queue, batching pending lines per job."""
+    open_fds: dict[str, int] = {}
+
+    while True:
+        batch = [_log_queue.get()]
+        deadline = time.monotonic() + LOG_BATCH_WINDOW
+        while len(batch) < LOG_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_log_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        lines_by_job: dict[str, list] = {}
+        closing = []
+        drain = False
+        for job_id, timestamp, message in batch:
+            if job_id is None:
+                drain = True
+                continue
+            if message is None:
+                closing.append(job_id)
+                continue
+            stamp = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+            lines_by_job.setdefault(job_id, []).append(f"[{stamp}] {message}\n".encode())
+
+        for job_id, lines in lines_by_job.items():
+            fd = open_fds.get(job_id)
+            if fd is None:
+                log_path = os.path.join(get_job_path(job_id), "logs.txt")
+                try:
+                    fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                except OSError as e:
+                    logger.error(f"[Job {job_id[-8:]}] Could not open log file: {e}")
+                    continue
+                open_fds[job_id] = fd
+            try:
+                os.writev(fd, lines)
+            except OSError as e:
+                logger.error(f"[Job {job_id[-8:]}] Could not write log file: {e}")
+
+        for job_id in closing:
+            fd = open_fds.pop(job_id, None)
+            if fd is not None:
+                os.close(fd)
+
+        if drain:
+            _log_drained.set()
+
+
+threading.Thread(target=_log_writer, name="log-writer", daemon=True).start()
 
 
 def append_log(job_id: str, message: str):
-    """Append a message to the job's log file."""
-    log_path = os.path.join(get_job_path(job_id), "logs.txt")
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_path, "a") as f:
-        f.write(f"[{timestamp}] {message}\n")
+    """Queue a message for the job's log file."""
+    _log_queue.put((job_id, time.time(), message))
 
 
-def create_zip_archive(job_id: str) -> str:
-    """Create a ZIP archive of downloaded images."""
-    job_path = get_job_path(job_id)
-    images_path = os.path.join(job_path, "images")
-    zip_path = os.path.join(job_path, "archive.zip")
+def close_log(job_id: str):
+    """Close the job's log file once any queued messages are written."""
+    _log_queue.put((job_id, None, None))
+
+
+def _flush_pending():
+    """Write out pending status updates and queued log lines."""
+    with JOB_LOCK:
+        job_ids = list(_dirty_jobs)
+    for job_id in job_ids:
+        try:
+            flush_status(job_id)
+        except OSError as e:
+            logger.error(f"[Job {job_id[-8:]}] Could not write status: {e}")
+
+    _log_drained.clear()
+    _log_queue.put((None, None, None))
+    _log_drained.wait(timeout=5)
+
+
+def shutdown():
+    """
+    Cancel jobs that have not started and flush pending status and log lines.
 
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        for filename in sorted(os.listdir(images_path)):
-            if filename.endswith(".jpg"):
-                file_path = os.path.join(images_path, filename)
-                zf.write(file_path, filename)
+    The interpreter joins the executor threads before atexit handlers run,
+    which would finish every queued job first, so this is called earlier:
+    from gunicorn's worker_exit hook (gunicorn.conf.py) or when the
+    development server stops. Running jobs are left to finish; whatever they
+    write afterwards is flushed by the atexit handler.
+    """
+    JOB_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    MONITOR_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    _flush_pending()
 
-    return zip_path
+
+atexit.register(_flush_pending)
+
+
+def run_pdf_task(fn, *args):
+    """
+    Run fn(*args) in PDF_POOL and return its result.
+
+    A worker that dies (e.g. killed for running out of memory) breaks the
+    whole pool, so a broken pool is replaced and the task retried once.
+    """
+    global PDF_POOL
+    pool = PDF_POOL
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        with _pdf_pool_lock:
+            if PDF_POOL is pool:
+                logger.warning("PDF worker process died - restarting the PDF pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                PDF_POOL = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            pool = PDF_POOL
+    return pool.submit(fn, *args).result()
 
 
 def create_pdf(job_id: str) -> str:
     """Create a PDF from downloaded images (optional)."""
-    try:
-        import img2pdf
-    except ImportError:
+    if img2pdf is None:
         return None
 
     job_path = get_job_path(job_id)
     images_path = os.path.join(job_path, "images")
     pdf_path = os.path.join(job_path, "archive.pdf")
 
-    image_files = sorted([
-        os.path.join(images_path, f)
-        for f in os.listdir(images_path)
-        if f.endswith(".jpg")
-    ])
+    image_files = [e.path for e in list_images(images_path)]
 
     if not image_files:
         return None
 
-    with open(pdf_path, "wb") as f:
-        f.write(img2pdf.convert(image_files))
+    run_pdf_task(images_to_pdf, image_files, pdf_path)
 
     return pdf_path
 
@@ -227,117 +662,192 @@ def get_batch_status_path(batch_id: str) -> str:
 
 def read_batch_status(batch_id: str) -> dict:
     """Read status.json for a batch."""
-    status_path = get_batch_status_path(batch_id)
-    if not os.path.exists(status_path):
+    if not is_valid_id(batch_id):
         return None
-    with open(status_path, "r") as f:
-        return json.load(f)
+    return read_json_cached(get_batch_status_path(batch_id))[0]
 
 
 def write_batch_status(batch_id: str, status: dict):
     """Write status.json for a batch."""
     status_path = get_batch_status_path(batch_id)
-    with open(status_path, "w") as f:
-        json.dump(status, f, indent=2)
+    write_file_atomic(status_path, orjson.dumps(status, option=STATUS_JSON_OPTIONS))
+    update_json_cache(status_path, status)
 
 
 def create_combined_pdf(batch_id: str, job_ids: list) -> str:
     """Create a combined PDF from all jobs in a batch."""
-    try:
-        import img2pdf
-    except ImportError:
-        logger.error(f"[Batch {batch_id[:8]}] img2pdf module not installed - cannot create combined PDF")
+    if img2pdf is None:
+        logger.error(f"[Batch {batch_id[-8:]}] img2pdf module not installed - cannot create combined PDF")
         return None
 
     batch_path = get_batch_path(batch_id)
     pdf_path = os.path.join(batch_path, "combined.pdf")
 
+    sig_path = pdf_path + ".sig"
+
     all_image_files = []
+    # Per-job PDFs that the job reported as created and that are newer than
+    # all of its images; None once any job with images lacks one
+    job_pdfs = [] if pikepdf is not None else None
+    # Fingerprint of the inputs: path, size and mtime of every image, in order
+    signature = hashlib.blake2b(digest_size=16)
     for job_id in job_ids:
         job_path = get_job_path(job_id)
         images_path = os.path.join(job_path, "images")
         if os.path.exists(images_path):
-            image_files = sorted([
-                os.path.join(images_path, f)
-                for f in os.listdir(images_path)
-                if f.endswith(".jpg")
-            ])
-            logger.info(f"[Batch {batch_id[:8]}] Found {len(image_files)} images in job {job_id[:8]}")
-            all_image_files.extend(image_files)
+            entries = list_images(images_path)
+            logger.info(f"[Batch {batch_id[-8:]}] Found {len(entries)} images in job {job_id[-8:]}")
+            newest = 0
+            for entry in entries:
+                st = entry.stat()
+                signature.update(f"{entry.path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+                all_image_files.append(entry.path)
+                newest = max(newest, st.st_mtime_ns)
+
+            if entries and job_pdfs is not None:
+                job_pdf_path = os.path.join(job_path, "archive.pdf")
+                job_status = read_status(job_id)
+                try:
+                    if not (job_status and job_status.get("pdf_available")):
+                        job_pdfs = None
+                    elif os.stat(job_pdf_path).st_mtime_ns >= newest:
+                        job_pdfs.append(job_pdf_path)
+                    else:
+                        job_pdfs = None
+                except FileNotFoundError:
+                    job_pdfs = None
 
     if not all_image_files:
-        logger.warning(f"[Batch {batch_id[:8]}] No images found for combined PDF")
+        logger.warning(f"[Batch {batch_id[-8:]}] No images found for combined PDF")
         return None
 
-    logger.info(f"[Batch {batch_id[:8]}] Combining {len(all_image_files)} images into PDF...")
-    with open(pdf_path, "wb") as f:
-        f.write(img2pdf.convert(all_image_files))
+    # Reuse the existing PDF if it was built from exactly these images
+    signature = signature.hexdigest()
+    try:
+        with open(sig_path, "r") as f:
+            if f.read() == signature and os.path.exists(pdf_path):
+                logger.info(f"[Batch {batch_id[-8:]}] Combined PDF is up to date")
+                return pdf_path
+    except FileNotFoundError:
+        pass
+
+    # The old signature is removed first so an interrupted write is never
+    # mistaken for a finished PDF
+    try:
+        os.remove(sig_path)
+    except FileNotFoundError:
+        pass
+
+    merged = False
+    if job_pdfs:
+        # Every job already has its pages as a PDF: copy them across instead
+        # of converting every JPEG again
+        logger.info(f"[Batch {batch_id[-8:]}] Merging {len(job_pdfs)} job PDFs...")
+        try:
+            run_pdf_task(merge_pdfs, job_pdfs, pdf_path)
+            merged = True
+        except Exception as e:
+            logger.warning(f"[Batch {batch_id[-8:]}] Merging job PDFs failed, converting images instead: {e}")
+    if not merged:
+        logger.info(f"[Batch {batch_id[-8:]}] Combining {len(all_image_files)} images into PDF...")
+        run_pdf_task(images_to_pdf, all_image_files, pdf_path)
+    write_file_atomic(sig_path, signature.encode())
 
-    logger.info(f"[Batch {batch_id[:8]}] Combined PDF saved to {pdf_path}")
+    logger.info(f"[Batch {batch_id[-8:]}] Combined PDF saved to {pdf_path}")
     return pdf_path
 
 
-def run_batch_monitor(batch_id: str, job_ids: list):
-    """Background thread to monitor batch completion and create combined PDF."""
-    import time
+# Batch monitors sleep on a per-batch condition that run_download_job
+# notifies whenever one of the batch's jobs finishes, instead of polling
+# every job's status. The timeout re-checks in case a worker dies without
+# notifying.
+BATCH_WAIT_TIMEOUT = 30
 
-    logger.info(f"[Batch {batch_id[:8]}] Monitor started, tracking {len(job_ids)} jobs")
-    poll_count = 0
+_batch_conditions: dict[str, threading.Condition] = {}
+_batch_conditions_lock = threading.Lock()
 
-    while True:
-        poll_count += 1
-        all_completed = True
-        any_failed = False
-        completed_count = 0
 
-        for job_id in job_ids:
-            status = read_status(job_id)
-            if status is None:
-                # Status file not ready yet - job hasn't started
-                all_completed = False
-                continue
-            if status["status"] in ("queued", "running"):
-                all_completed = False
-            elif status["status"] == "failed":
-                any_failed = True
-                completed_count += 1
-            elif status["status"] == "completed":
-                completed_count += 1
-
-        # Log progress every 5 polls (10 seconds)
-        if poll_count % 5 == 0:
-            logger.info(f"[Batch {batch_id[:8]}] Progress: {completed_count}/{len(job_ids)} jobs done")
-
-        # Only mark complete when ALL jobs are actually done
-        if all_completed and completed_count == len(job_ids):
-            logger.info(f"[Batch {batch_id[:8]}] All jobs completed ({completed_count}/{len(job_ids)})")
-            batch_status = read_batch_status(batch_id)
-            if batch_status:
-                if any_failed:
-                    batch_status["status"] = "completed_with_errors"
-                    logger.warning(f"[Batch {batch_id[:8]}] Completed with errors")
-                else:
-                    batch_status["status"] = "completed"
-                    logger.info(f"[Batch {batch_id[:8]}] Completed successfully")
-
-                # Try to create combined PDF
-                try:
-                    logger.info(f"[Batch {batch_id[:8]}] Creating combined PDF...")
-                    pdf_path = create_combined_pdf(batch_id, job_ids)
-                    batch_status["combined_pdf_available"] = pdf_path is not None
-                    if pdf_path:
-                        logger.info(f"[Batch {batch_id[:8]}] Combined PDF created: {pdf_path}")
-                    else:
-                        logger.warning(f"[Batch {batch_id[:8]}] Combined PDF creation returned None (img2pdf may not be installed)")
-                except Exception as e:
-                    logger.error(f"[Batch {batch_id[:8]}] Failed to create combined PDF: {str(e)}")
-                    batch_status["combined_pdf_available"] = False
+def notify_batch(batch_id: str):
+    """Wake the monitor of a batch after one of its jobs has finished."""
+    with _batch_conditions_lock:
+        condition = _batch_conditions.get(batch_id)
+    if condition is not None:
+        with condition:
+            condition.notify_all()
 
-                batch_status["completed_at"] = datetime.now().isoformat()
-                write_batch_status(batch_id, batch_status)
-            break
 
-        time.sleep(2)
+def count_finished_jobs(job_ids: list) -> tuple:
+    """Return (number of finished jobs, whether any of them failed)."""
+    finished = 0
+    any_failed = False
+    for job_id in job_ids:
+        status = read_status(job_id)
+        if status is None:
+            # Status not written yet - job hasn't been created
+            continue
+        if status["status"] == "failed":
+            any_failed = True
+            finished += 1
+        elif status["status"] == "completed":
+            finished += 1
+    return finished, any_failed
+
+
+def run_batch_monitor(batch_id: str, job_ids: list):
+    """Background thread to wait for batch completion and create combined PDF."""
+    # Monitors may be started again for a batch (e.g. after a restart); one
+    # that has already finished with its combined PDF has nothing left to do
+    batch_status = read_batch_status(batch_id)
+    if (batch_status
+            and batch_status["status"] in ("completed", "completed_with_errors")
+            and batch_status.get("combined_pdf_available")
+            and os.path.exists(os.path.join(get_batch_path(batch_id), "combined.pdf"))):
+        logger.info(f"[Batch {batch_id[-8:]}] Already completed")
+        return
+
+    logger.info(f"[Batch {batch_id[-8:]}] Monitor started, tracking {len(job_ids)} jobs")
+
+    with _batch_conditions_lock:
+        condition = _batch_conditions.setdefault(batch_id, threading.Condition())
+
+    # Statuses are checked while holding the condition, and jobs notify only
+    # after writing their final status, so no completion can be missed
+    with condition:
+        while True:
+            completed_count, any_failed = count_finished_jobs(job_ids)
+            if completed_count == len(job_ids):
+                break
+            logger.info(f"[Batch {batch_id[-8:]}] Progress: {completed_count}/{len(job_ids)} jobs done")
+            condition.wait(timeout=BATCH_WAIT_TIMEOUT)
+
+    with _batch_conditions_lock:
+        _batch_conditions.pop(batch_id, None)
+
+    logger.info(f"[Batch {batch_id[-8:]}] All jobs completed ({completed_count}/{len(job_ids)})")
+    batch_status = read_batch_status(batch_id)
+    if batch_status:
+        if any_failed:
+            batch_status["status"] = "completed_with_errors"
+            logger.warning(f"[Batch {batch_id[-8:]}] Completed with errors")
+        else:
+            batch_status["status"] = "completed"
+            logger.info(f"[Batch {batch_id[-8:]}] Completed successfully")
+
+        # Try to create combined PDF
+        try:
+            logger.info(f"[Batch {batch_id[-8:]}] Creating combined PDF...")
+            pdf_path = create_combined_pdf(batch_id, job_ids)
+            batch_status["combined_pdf_available"] = pdf_path is not None
+            if pdf_path:
+                logger.info(f"[Batch {batch_id[-8:]}] Combined PDF created: {pdf_path}")
+            else:
+                logger.warning(f"[Batch {batch_id[-8:]}] Combined PDF creation returned None (img2pdf may not be installed)")
+        except Exception as e:
+            logger.error(f"[Batch {batch_id[-8:]}] Failed to create combined PDF: {str(e)}")
+            batch_status["combined_pdf_available"] = False
+
+        batch_status["completed_at"] = datetime.now().isoformat()
+        write_batch_status(batch_id, batch_status)
 
 
 def run_download_job(job_id: str, catalog_url: str, start_page: int, end_page: int):
@@ -346,7 +856,8 @@ def run_download_job(job_id: str, catalog_url: str, start_page: int, end_page: i
     images_path = os.path.join(job_path, "images")
     os.makedirs(images_path, exist_ok=True)
 
-    # Update status to running
+    # This thread is the only writer of the job's status, so it keeps its
+    # own copy and publishes it after each change instead of re-reading it
     status = read_status(job_id)
     status["status"] = "running"
     status["started_at"] = datetime.now().isoformat()
@@ -354,10 +865,7 @@ def run_download_job(job_id: str, catalog_url: str, start_page: int, end_page: i
     append_log(job_id, "Job started")
 
     def progress_callback(pages_done: int, pages_total: int, message: str):
-        status = read_status(job_id)
-        status["pages_done"] = pages_done
-        status["pages_total"] = pages_total
-        status["message"] = message
+        status.update(pages_done=pages_done, pages_total=pages_total, message=message)
         write_status(job_id, status)
         append_log(job_id, message)
 
@@ -370,10 +878,6 @@ def run_download_job(job_id: str, catalog_url: str, start_page: int, end_page: i
             progress_cb=progress_callback
         )
 
-        # Create ZIP archive
-        append_log(job_id, "Creating ZIP archive...")
-        zip_path = create_zip_archive(job_id)
-
         # Try to create PDF (optional)
         pdf_available = False
         try:
@@ -384,7 +888,6 @@ def run_download_job(job_id: str, catalog_url: str, start_page: int, end_page: i
             append_log(job_id, f"PDF creation failed: {str(e)}")
 
         # Update final status
-        status = read_status(job_id)
         status["status"] = "completed"
         status["completed_at"] = datetime.now().isoformat()
         status["result"] = result
@@ -394,13 +897,17 @@ def run_download_job(job_id: str, catalog_url: str, start_page: int, end_page: i
         append_log(job_id, "Job completed")
 
     except Exception as e:
-        status = read_status(job_id)
         status["status"] = "failed"
         status["error"] = str(e)
         status["completed_at"] = datetime.now().isoformat()
         write_status(job_id, status)
         append_log(job_id, f"Job failed: {str(e)}")
 
+    finally:
+        close_log(job_id)
+        if status.get("batch_id"):
+            notify_batch(status["batch_id"])
+
 
 @app.route("/jobs", methods=["POST"])
 @limiter.limit(JOBS_CREATE_LIMIT)
@@ -419,8 +926,8 @@ def create_job():
     # Validate URL
     if not catalog_url:
         return jsonify({"error": "catalog_url is required"}), 400
-    if "catalog.archives.gov" not in catalog_url:
-        return jsonify({"error": "URL must be from catalog.archives.gov"}), 400
+    if not CATALOG_URL_PATTERN.match(catalog_url):
+        return jsonify({"error": "URL must be a catalog.archives.gov record (https://catalog.archives.gov/id/...)"}), 400
 
     # Validate page range
     try:
@@ -437,7 +944,7 @@ def create_job():
         return jsonify({"error": f"Maximum {MAX_PAGES} pages per request"}), 400
 
     # Create job
-    job_id = str(uuid.uuid4())
+    job_id = new_id()
     job_path = get_job_path(job_id)
     os.makedirs(job_path, exist_ok=True)
 
@@ -458,18 +965,16 @@ def create_job():
     write_status(job_id, status)
     append_log(job_id, f"Job created: {catalog_url} pages {start_page}-{end_page}")
 
-    # Start background thread
-    thread = threading.Thread(
-        target=run_download_job,
-        args=(job_id, catalog_url, start_page, end_page),
-        daemon=True
-    )
-    thread.start()
+    # Queue on the job pool
+    JOB_EXECUTOR.submit(run_download_job, job_id, catalog_url, start_page, end_page)
+    # The queue still holds this job unless a free worker already took it
+    queue_position = max(JOB_EXECUTOR._work_queue.qsize() - 1, 0)
 
     return jsonify({
         "job_id": job_id,
-        "status_url": f"/jobs/{job_id}"
-    }), 201
+        "status_url": f"/jobs/{job_id}",
+        "queue_position": queue_position
+    }), 202
 
 
 @app.route("/jobs/batch", methods=["POST"])
@@ -487,8 +992,8 @@ def create_batch_job():
     # Validate URL
     if not catalog_url:
         return jsonify({"error": "catalog_url is required"}), 400
-    if "catalog.archives.gov" not in catalog_url:
-        return jsonify({"error": "URL must be from catalog.archives.gov"}), 400
+    if not CATALOG_URL_PATTERN.match(catalog_url):
+        return jsonify({"error": "URL must be a catalog.archives.gov record (https://catalog.archives.gov/id/...)"}), 400
 
     # Validate ranges
     if not ranges or not isinstance(ranges, list):
@@ -518,7 +1023,7 @@ def create_batch_job():
         return jsonify({"error": f"Total pages across all ranges cannot exceed {MAX_PAGES}"}), 400
 
     # Create batch
-    batch_id = str(uuid.uuid4())
+    batch_id = new_id()
     batch_path = get_batch_path(batch_id)
     os.makedirs(batch_path, exist_ok=True)
 
@@ -526,7 +1031,7 @@ def create_batch_job():
     job_ids = []
     jobs_info = []
     for i, r in enumerate(validated_ranges):
-        job_id = str(uuid.uuid4())
+        job_id = new_id()
         job_path = get_job_path(job_id)
         os.makedirs(job_path, exist_ok=True)
 
@@ -556,13 +1061,7 @@ def create_batch_job():
             "status_url": f"/jobs/{job_id}"
         })
 
-        # Start background thread for this job
-        thread = threading.Thread(
-            target=run_download_job,
-            args=(job_id, catalog_url, r["start_page"], r["end_page"]),
-            daemon=True
-        )
-        thread.start()
+        JOB_EXECUTOR.submit(run_download_job, job_id, catalog_url, r["start_page"], r["end_page"])
 
     # Initialize batch status
     batch_status = {
@@ -576,13 +1075,7 @@ def create_batch_job():
     }
     write_batch_status(batch_id, batch_status)
 
-    # Start batch monitor thread
-    monitor_thread = threading.Thread(
-        target=run_batch_monitor,
-        args=(batch_id, job_ids),
-        daemon=True
-    )
-    monitor_thread.start()
+    MONITOR_EXECUTOR.submit(run_batch_monitor, batch_id, job_ids)
 
     return jsonify({
         "batch_id": batch_id,
@@ -628,22 +1121,42 @@ def download_batch_pdf(batch_id: str):
     if not os.path.exists(pdf_path):
         return jsonify({"error": "PDF file not found"}), 404
 
-    return send_file(
-        pdf_path,
-        as_attachment=True,
-        download_name=f"nara-batch-{batch_id[:8]}.pdf",
-        mimetype="application/pdf"
-    )
+    return send_job_file(pdf_path, f"nara-batch-{batch_id[-8:]}.pdf", "application/pdf")
+
+
+def status_json(job_id: str, status: dict, version: int) -> bytes:
+    """Serialize a job status for a response, reusing the body while the version is unchanged."""
+    cached = _status_json_cache.get(job_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    body = orjson.dumps(status)
+    with JOB_LOCK:
+        # Finished jobs are evicted from memory; don't cache their bodies
+        if job_id in JOB_STATE:
+            _status_json_cache[job_id] = (version, body)
+    return body
 
 
 @app.route("/jobs/<job_id>", methods=["GET"])
 @limiter.limit(JOBS_STATUS_LIMIT)
 def get_job_status(job_id: str):
-    """Get the status of a job."""
-    status = read_status(job_id)
+    """
+    Get the status of a job.
+
+    Responses carry a weak ETag that changes whenever the status does, so
+    polling clients sending If-None-Match get an empty 304 until it changes.
+    """
+    status, version = read_status_versioned(job_id)
     if status is None:
         return jsonify({"error": "Job not found"}), 404
-    return jsonify(status)
+
+    etag = f"{status['status']}-{version}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(status_json(job_id, status, version), mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    return response
 
 
 @app.route("/jobs/<job_id>/download.zip", methods=["GET"])
@@ -657,15 +1170,20 @@ def download_zip(job_id: str):
     if status["status"] != "completed":
         return jsonify({"error": "Job not completed"}), 400
 
-    zip_path = os.path.join(get_job_path(job_id), "archive.zip")
-    if not os.path.exists(zip_path):
-        return jsonify({"error": "ZIP file not found"}), 404
+    images_path = os.path.join(get_job_path(job_id), "images")
+    if not os.path.exists(images_path):
+        return jsonify({"error": "Images not found"}), 404
 
-    return send_file(
-        zip_path,
-        as_attachment=True,
-        download_name=f"nara-{job_id[:8]}.zip",
-        mimetype="application/zip"
+    # The archive is built on the fly from the downloaded images
+    files = [(e.path, e.name) for e in list_images(images_path)]
+
+    return Response(
+        stream_zip(files, compresslevel=ZIP_COMPRESSLEVEL, checksums=load_checksums(images_path)),
+        mimetype="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename=nara-{job_id[-8:]}.zip",
+            "X-Accel-Buffering": "no"
+        }
     )
 
 
@@ -687,12 +1205,7 @@ def download_pdf(job_id: str):
     if not os.path.exists(pdf_path):
         return jsonify({"error": "PDF file not found"}), 404
 
-    return send_file(
-        pdf_path,
-        as_attachment=True,
-        download_name=f"nara-{job_id[:8]}.pdf",
-        mimetype="application/pdf"
-    )
+    return send_job_file(pdf_path, f"nara-{job_id[-8:]}.pdf", "application/pdf")
 
 
 @app.route("/health", methods=["GET"])
@@ -705,4 +1218,9 @@ def health_check():
 if __name__ == "__main__":
     os.makedirs(JOBS_DIR, exist_ok=True)
     os.makedirs(BATCH_DIR, exist_ok=True)
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    # SIGTERM would otherwise kill the process without any cleanup
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        app.run(host="0.0.0.0", port=5001, debug=True)
+    finally:
+        shutdown()
@@ -6,37 +6,120 @@ Run periodically (e.g., via cron) to remove old jobs.
 
 import os
 import shutil
-import json
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+# orjson is used when available; cleanup can also run with only the stdlib
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 JOBS_DIR = os.path.join(os.path.dirname(__file__), "jobs")
+BATCH_DIR_NAME = "_batches"
 DEFAULT_TTL_HOURS = 24
+CLEANUP_WORKERS = 8
+
+# Progress snapshots of running jobs written by app.py, one <job_id>.json each
+HOT_STATUS_DIR = os.environ.get("HOT_STATUS_DIR", "/dev/shm/nara-jobs")
+
+
+def scan_dirs(path: str) -> list:
+    """List the subdirectories of path as DirEntry objects, without following symlinks."""
+    with os.scandir(path) as it:
+        return [e for e in it if e.is_dir(follow_symlinks=False)]
+
+
+def iter_job_folders():
+    """
+    Yield (job_id, path) for every job and batch folder.
+
+    Job folders are sharded as jobs/yz/wx/<job_id>; batches live in
+    jobs/_batches/<batch_id>. Any other top-level folder is treated as an
+    unsharded job folder.
+    """
+    for entry in scan_dirs(JOBS_DIR):
+        if entry.name == BATCH_DIR_NAME:
+            for batch in scan_dirs(entry.path):
+                yield batch.name, batch.path
+        elif len(entry.name) == 2:
+            for shard in scan_dirs(entry.path):
+                for job in scan_dirs(shard.path):
+                    yield job.name, job.path
+        else:
+            yield entry.name, entry.path
 
 
 def get_job_age(job_path: str) -> timedelta:
     """Get the age of a job based on its status.json."""
     status_path = os.path.join(job_path, "status.json")
 
-    if not os.path.exists(status_path):
+    try:
+        with open(status_path, "rb") as f:
+            status = json_loads(f.read())
+            # Use completed_at if available, otherwise created_at
+            timestamp = status.get("completed_at") or status.get("created_at")
+            if timestamp:
+                created = datetime.fromisoformat(timestamp)
+            else:
+                created = datetime.fromtimestamp(os.fstat(f.fileno()).st_mtime)
+    except FileNotFoundError:
         # No status file, use folder modification time
-        mtime = os.path.getmtime(job_path)
-        created = datetime.fromtimestamp(mtime)
-    else:
-        with open(status_path, "r") as f:
-            status = json.load(f)
-
-        # Use completed_at if available, otherwise created_at
-        timestamp = status.get("completed_at") or status.get("created_at")
-        if timestamp:
-            created = datetime.fromisoformat(timestamp)
-        else:
-            mtime = os.path.getmtime(status_path)
-            created = datetime.fromtimestamp(mtime)
+        created = datetime.fromtimestamp(os.stat(job_path).st_mtime)
 
     return datetime.now() - created
 
 
+def remove_empty_shards(job_path: str):
+    """Remove the shard folders above a deleted job if they are now empty."""
+    shard_path = os.path.dirname(job_path)
+    if len(os.path.relpath(shard_path, JOBS_DIR).split(os.sep)) != 2:
+        return  # not a sharded job folder
+
+    for path in (shard_path, os.path.dirname(shard_path)):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+
+
+def remove_job_folder(job_path: str):
+    """Delete a job folder and any shard folders it leaves empty."""
+    shutil.rmtree(job_path)
+    remove_empty_shards(job_path)
+
+
+def cleanup_hot_status(ttl: timedelta, removed: list, dry_run: bool = False):
+    """
+    Remove progress snapshots of removed jobs, and any not updated within the TTL.
+
+    A running job rewrites its snapshot every few seconds, so an old one was
+    left behind by a process that died mid-job.
+    """
+    try:
+        with os.scandir(HOT_STATUS_DIR) as it:
+            entries = [e for e in it if e.name.endswith(".json")]
+    except FileNotFoundError:
+        return
+
+    removed = set(removed)
+    now = time.time()
+    for entry in entries:
+        try:
+            stale = entry.name[:-len(".json")] in removed or now - entry.stat().st_mtime > ttl.total_seconds()
+            if not stale:
+                continue
+            if dry_run:
+                print(f"Would remove snapshot: {entry.name}")
+            else:
+                os.remove(entry.path)
+                print(f"Removed snapshot: {entry.name}")
+        except FileNotFoundError:
+            continue
+
+
 def cleanup_jobs(ttl_hours: int = DEFAULT_TTL_HOURS, dry_run: bool = False) -> list:
     """
     Remove jobs older than TTL.
@@ -55,28 +138,45 @@ def cleanup_jobs(ttl_hours: int = DEFAULT_TTL_HOURS, dry_run: bool = False) -> l
     removed = []
     ttl = timedelta(hours=ttl_hours)
 
-    for job_id in os.listdir(JOBS_DIR):
-        job_path = os.path.join(JOBS_DIR, job_id)
-
-        if not os.path.isdir(job_path):
-            continue
-
+    expired = []
+    for job_id, job_path in iter_job_folders():
         try:
             age = get_job_age(job_path)
-
-            if age > ttl:
-                if dry_run:
-                    print(f"Would remove: {job_id} (age: {age})")
-                else:
-                    shutil.rmtree(job_path)
-                    print(f"Removed: {job_id} (age: {age})")
-                removed.append(job_id)
-            else:
-                print(f"Keeping: {job_id} (age: {age})")
-
         except Exception as e:
             print(f"Error processing {job_id}: {e}")
+            continue
 
+        if age > ttl:
+            expired.append((job_id, job_path, age))
+        else:
+            print(f"Keeping: {job_id} (age: {age})")
+
+    if dry_run:
+        for job_id, job_path, age in expired:
+            print(f"Would remove: {job_id} (age: {age})")
+            removed.append(job_id)
+        cleanup_hot_status(ttl, removed, dry_run=True)
+        return removed
+
+    # Job folders are independent, so they are deleted in parallel to
+    # overlap the per-file unlink latency
+    def remove(job_path: str):
+        try:
+            remove_job_folder(job_path)
+        except Exception as e:
+            return e
+        return None
+
+    with ThreadPoolExecutor(max_workers=CLEANUP_WORKERS) as executor:
+        errors = executor.map(remove, [job_path for _, job_path, _ in expired])
+        for (job_id, job_path, age), error in zip(expired, errors):
+            if error is not None:
+                print(f"Error processing {job_id}: {error}")
+                continue
+            print(f"Removed: {job_id} (age: {age})")
+            removed.append(job_id)
+
+    cleanup_hot_status(ttl, removed)
     return removed
 
 
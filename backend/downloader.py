@@ -7,41 +7,202 @@ Can be used as:
 """
 
 import os
+import json
+import shutil
 import time
+import zlib
 import requests
 import pathlib
 import sys
 import re
-from typing import Callable, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional, Tuple
+import urllib3
+from urllib3.util.retry import Retry
 
 UA = "Mozilla/5.0 (compatible; nara-downloader/1.0)"
+DOWNLOAD_WORKERS = 8
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Requests to NARA are limited to REQUEST_RATE per second on average across
+# all downloads in the process. Up to REQUEST_BURST requests may start back
+# to back after an idle period.
+REQUEST_RATE = 10
+REQUEST_BURST = DOWNLOAD_WORKERS
+
+# Shared session so connections to NARA are kept alive between pages and jobs.
+# The pool is large enough for two jobs downloading at full concurrency.
+# Connection errors and throttling/5xx responses are retried with backoff;
+# if retries run out the last response is returned as usual.
+SESSION = requests.Session()
+SESSION.headers["User-Agent"] = UA
+SESSION.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=2 * DOWNLOAD_WORKERS,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False
+    )
+))
+
+# Sidecar file in the output directory mapping image filename to
+# [crc32, size], recorded as images are downloaded
+CHECKSUMS_FILENAME = "checksums.json"
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilling at `rate` tokens per second, up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until it is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # A negative balance reserves a future token, so waiting callers
+            # are served in order without polling
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+REQUEST_BUCKET = TokenBucket(REQUEST_RATE, REQUEST_BURST)
 
 
 def fetch_json(url: str) -> dict:
     """Fetch JSON from URL with appropriate headers."""
-    r = requests.get(
+    r = SESSION.get(
         url,
-        headers={"User-Agent": UA, "Accept": "application/json"},
+        headers={"Accept": "application/json"},
         timeout=30
     )
     r.raise_for_status()
     return r.json()
 
 
-def download_file(url: str, path: str) -> bool:
-    """Download a file from URL to path."""
-    r = requests.get(
-        url,
-        headers={"User-Agent": UA},
-        stream=True,
-        timeout=120
-    )
+class ChecksumWriter:
+    """File wrapper that tracks the CRC32 and size of everything written through it."""
+
+    def __init__(self, f, crc: int = 0, size: int = 0):
+        self.f = f
+        self.crc = crc
+        self.size = size
+
+    def write(self, data: bytes) -> int:
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        return self.f.write(data)
+
+
+def file_crc32(path: str) -> Tuple[int, int]:
+    """Compute (crc32, size) of a file on disk."""
+    crc = 0
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+    return crc, size
+
+
+def remote_size(url: str) -> Optional[int]:
+    """Get the size of a remote file from a HEAD request, or None if unknown."""
+    REQUEST_BUCKET.acquire()
+    r = SESSION.head(url, allow_redirects=True, timeout=30)
     if r.status_code != 200:
-        return False
-    with open(path, "wb") as f:
-        for chunk in r.iter_content(1024 * 256):
-            f.write(chunk)
-    return True
+        return None
+    length = r.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+
+def download_file(url: str, path: str, resume: bool = True) -> Optional[Tuple[int, int]]:
+    """
+    Download a file from URL to path.
+
+    The file is written to path + ".part" and only renamed to path once it is
+    complete, so a failed download never leaves a truncated file at path.
+
+    Args:
+        resume: Continue an existing .part file by requesting the rest with a
+            Range header; if the server ignores the range or answers with a
+            different one the file is downloaded again from the start.
+
+    Returns:
+        (crc32, size) of the written file, or None if the download failed
+    """
+    part_path = path + ".part"
+    offset = 0
+    if resume:
+        try:
+            offset = os.stat(part_path).st_size
+        except FileNotFoundError:
+            pass
+
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+    REQUEST_BUCKET.acquire()
+    with SESSION.get(url, headers=headers, stream=True, timeout=120) as r:
+        content_range = r.headers.get("Content-Range", "")
+        if offset and r.status_code == 416:
+            # The .part file is not a prefix of the remote file
+            restart = True
+        elif r.status_code == 206 and not content_range.startswith(f"bytes {offset}-"):
+            # Only a body that starts where the .part file ends can be appended
+            restart = True
+        else:
+            restart = False
+            if offset and r.status_code == 206:
+                crc, size = file_crc32(part_path)
+                mode = "ab"
+            elif r.status_code == 200:
+                crc, size = 0, 0
+                mode = "wb"
+            else:
+                return None
+            # Copy the raw stream in large blocks rather than iterating over
+            # iter_content() chunks
+            r.raw.decode_content = True
+            with open(part_path, mode) as f:
+                writer = ChecksumWriter(f, crc, size)
+                try:
+                    shutil.copyfileobj(r.raw, writer, COPY_BUFFER_SIZE)
+                except urllib3.exceptions.HTTPError as e:
+                    # Reading r.raw directly bypasses the wrapping iter_content()
+                    # does, so errors mid-body are re-raised as requests errors
+                    raise requests.ConnectionError(e) from e
+
+    if restart:
+        return download_file(url, path, resume=False)
+    os.replace(part_path, path)
+    return writer.crc, writer.size
+
+
+def load_checksums(out_dir: str) -> dict:
+    """Load the {filename: [crc32, size]} checksums recorded in out_dir."""
+    try:
+        with open(os.path.join(out_dir, CHECKSUMS_FILENAME), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_checksums(out_dir: str, checksums: dict):
+    """Write the {filename: [crc32, size]} checksums for out_dir."""
+    with open(os.path.join(out_dir, CHECKSUMS_FILENAME), "w") as f:
+        json.dump(checksums, f)
 
 
 def extract_naid(catalog_url: str) -> Optional[str]:
@@ -57,7 +218,8 @@ def download_range(
     out_dir: str,
     start_page: int,
     end_page: int,
-    progress_cb: Optional[Callable[[int, int, str], None]] = None
+    progress_cb: Optional[Callable[[int, int, str], None]] = None,
+    max_workers: int = DOWNLOAD_WORKERS
 ) -> dict:
     """
     Download a range of images from a NARA catalog record.
@@ -67,7 +229,9 @@ def download_range(
         out_dir: Directory to save downloaded images
         start_page: First page to download (1-indexed)
         end_page: Last page to download (1-indexed, inclusive)
-        progress_cb: Optional callback function(pages_done, pages_total, message)
+        progress_cb: Optional callback function(pages_done, pages_total, message).
+            Always called from the calling thread.
+        max_workers: Number of pages to download concurrently
 
     Returns:
         dict with keys: success, total_available, downloaded, errors, skipped
@@ -139,35 +303,85 @@ def download_range(
 
     log(f"Downloading pages {start_page} to {actual_end}...", pages_done, pages_to_download)
 
-    for page_num in range(start_page, actual_end + 1):
+    def fetch_page(page_num: int) -> Tuple[str, str, Optional[Tuple[int, int]]]:
+        """Download a single page, returning (outcome, message, checksum)."""
         obj = digital_objects[page_num - 1]  # 1-indexed to 0-indexed
 
         img_url = obj.get("objectUrl")
         if not img_url:
-            result["errors"].append(f"No URL for page {page_num}")
-            log(f"No URL for page {page_num}", pages_done, pages_to_download)
-            continue
+            return "missing", f"No URL for page {page_num}", None
 
         original_filename = obj.get("objectFilename", f"{page_num:04d}.jpg")
         filename = f"{page_num:04d}.jpg"
         path = os.path.join(out_dir, filename)
 
-        if os.path.exists(path):
-            result["skipped"] += 1
-            pages_done += 1
-            log(f"Skipped existing {filename}", pages_done, pages_to_download)
-            continue
-
-        if download_file(img_url, path):
-            result["downloaded"] += 1
-            pages_done += 1
-            log(f"Downloaded {filename} ({original_filename})", pages_done, pages_to_download)
-        else:
-            result["errors"].append(f"Failed to download page {page_num}")
-            pages_done += 1
-            log(f"Failed to download {filename}", pages_done, pages_to_download)
-
-        time.sleep(0.1)  # polite delay
+        try:
+            local_size = os.stat(path).st_size
+        except FileNotFoundError:
+            local_size = None
+
+        # Downloads only appear at path once complete; an interrupted one is
+        # left in a .part file and resumed. An existing file is skipped unless
+        # its size differs from the upstream one, taken from the record
+        # metadata or a HEAD request if missing, in which case it and any
+        # .part file are replaced by a fresh download.
+        resume = True
+        if local_size is not None:
+            try:
+                expected_size = int(obj["objectFileSize"])
+            except (KeyError, TypeError, ValueError):
+                expected_size = remote_size(img_url)
+            if expected_size is None or local_size == expected_size:
+                return "skipped", f"Skipped existing {filename}", None
+            resume = False
+
+        resumed = resume and os.path.exists(path + ".part")
+        checksum = download_file(img_url, path, resume)
+        if checksum is not None:
+            action = "Resumed" if resumed else "Downloaded"
+            return "downloaded", f"{action} {filename} ({original_filename})", checksum
+        return "failed", f"Failed to download {filename}", None
+
+    # CRC32s are recorded while downloading so archives can be built
+    # later without reading every image a second time
+    checksums = load_checksums(out_dir)
+
+    # Pages are fetched concurrently; results are handled here as they
+    # complete so result and progress_cb are only touched by this thread
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_page, page_num): page_num
+            for page_num in range(start_page, actual_end + 1)
+        }
+        try:
+            for future in as_completed(futures):
+                page_num = futures[future]
+                try:
+                    outcome, message, checksum = future.result()
+                except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+                    outcome, message, checksum = "failed", f"Failed to download page {page_num}: {str(e)}", None
+
+                if outcome == "missing":
+                    result["errors"].append(message)
+                    log(message, pages_done, pages_to_download)
+                    continue
+
+                pages_done += 1
+                if outcome == "skipped":
+                    result["skipped"] += 1
+                elif outcome == "downloaded":
+                    result["downloaded"] += 1
+                    checksums[f"{page_num:04d}.jpg"] = list(checksum)
+                else:
+                    result["errors"].append(f"Failed to download page {page_num}")
+                log(message, pages_done, pages_to_download)
+        except BaseException:
+            # The job is failing; don't download the rest of the range first
+            executor.shutdown(cancel_futures=True)
+            raise
+
+    if result["downloaded"]:
+        save_checksums(out_dir, checksums)
 
     result["success"] = len(result["errors"]) == 0
     log("Download complete!", pages_done, pages_to_download)
@@ -0,0 +1,8 @@
+"""Gunicorn settings that have to live in code rather than on the command line."""
+
+
+def worker_exit(server, worker):
+    """Cancel queued jobs and flush job state before the worker's threads are joined."""
+    import app
+
+    app.shutdown()
@@ -0,0 +1,39 @@
+"""
+PDF assembly run in worker processes.
+
+Converting hundreds of JPEGs or merging large PDFs is CPU-bound and holds
+the GIL, so app.py runs these functions in a process pool rather than in
+the request-serving process. This module only depends on the PDF libraries;
+under gunicorn it is all a worker process imports. (When app.py is run
+directly, spawn also re-imports app.py in each worker as __mp_main__.)
+"""
+
+from contextlib import ExitStack
+from typing import List
+
+# PDF output is optional
+try:
+    import img2pdf
+except ImportError:
+    img2pdf = None
+
+# Combined PDFs are merged from per-job PDFs when pikepdf is available
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None
+
+
+def images_to_pdf(image_files: List[str], pdf_path: str):
+    """Write a PDF with one page per image, streamed straight to pdf_path."""
+    with open(pdf_path, "wb") as f:
+        img2pdf.convert(image_files, outputstream=f)
+
+
+def merge_pdfs(pdf_paths: List[str], pdf_path: str):
+    """Write a PDF containing the pages of each PDF in pdf_paths, in order."""
+    with ExitStack() as stack, pikepdf.Pdf.new() as combined:
+        for source_path in pdf_paths:
+            source = stack.enter_context(pikepdf.open(source_path))
+            combined.pages.extend(source.pages)
+        combined.save(pdf_path)
@@ -0,0 +1,228 @@
+"""
+Streaming ZIP writer.
+
+Builds a ZIP archive on the fly from files on disk, yielding bytes as they
+are produced so an archive can be sent to a client without first being
+written to disk. By default entries are stored (not compressed) and use
+data descriptors, so each file is read exactly once; when a file's CRC is
+already known it goes in the local header and the file is only copied.
+When a compression level is given, files are deflated in parallel by a
+thread pool (zlib releases the GIL) while the archive is still written
+in order.
+"""
+
+import os
+import time
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+DEFLATE_WORKERS = os.cpu_count() or 1
+
+# Precompiled record layouts
+LOCAL_FILE_HEADER = struct.Struct("<IHHHHHIIIHH")
+DATA_DESCRIPTOR = struct.Struct("<IIII")
+CENTRAL_DIRECTORY_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+ZIP64_EXTRA = struct.Struct("<HHQ")
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<IQHHIIQQQQ")
+ZIP64_END_LOCATOR = struct.Struct("<IIQI")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+
+
+def dos_datetime(timestamp: float) -> Tuple[int, int]:
+    """Convert a POSIX timestamp to MS-DOS (time, date) fields."""
+    t = time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def deflate_file(path: str, compresslevel: int) -> Tuple[bytes, int, int]:
+    """Raw-deflate a file, returning (compressed data, crc32, original size)."""
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+    parts = []
+    crc = 0
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    return b"".join(parts), crc, size
+
+
+def deflate_files(
+    files: Iterable[Tuple[str, str]],
+    compresslevel: int
+) -> Iterator[Tuple[str, str, Tuple[bytes, int, int]]]:
+    """
+    Deflate files in parallel, yielding (path, arcname, result) in input order.
+
+    At most 2 * DEFLATE_WORKERS files are in flight at once, so memory use
+    stays bounded however many files there are.
+    """
+    with ThreadPoolExecutor(max_workers=DEFLATE_WORKERS) as executor:
+        pending = deque()
+        for path, arcname in files:
+            pending.append((path, arcname, executor.submit(deflate_file, path, compresslevel)))
+            if len(pending) >= 2 * DEFLATE_WORKERS:
+                path, arcname, future = pending.popleft()
+                yield path, arcname, future.result()
+        while pending:
+            path, arcname, future = pending.popleft()
+            yield path, arcname, future.result()
+
+
+def stream_zip(
+    files: Iterable[Tuple[str, str]],
+    compresslevel: Optional[int] = None,
+    checksums: Optional[dict] = None
+) -> Iterator[bytes]:
+    """
+    Generate a ZIP archive from (path, arcname) pairs.
+
+    Args:
+        files: Iterable of (path on disk, name inside the archive)
+        compresslevel: zlib level to deflate entries with, or None to store them
+        checksums: Optional {arcname: (crc32, size)} for stored entries. Files
+            whose size still matches are written without a second CRC pass.
+
+    Yields:
+        Chunks of the archive, in order
+    """
+    if compresslevel is None:
+        entries = ((path, arcname, None) for path, arcname in files)
+    else:
+        entries = deflate_files(files, compresslevel)
+
+    offset = 0
+    central_directory = []
+
+    for path, arcname, deflated in entries:
+        name = arcname.encode("utf-8")
+        flags = 0 if arcname.isascii() else FLAG_UTF8
+        st = os.stat(path)
+        dos_time, dos_date = dos_datetime(st.st_mtime)
+
+        if deflated is None:
+            method = ZIP_STORED
+            known = checksums.get(arcname) if checksums else None
+            if known is not None and known[1] == st.st_size:
+                # CRC recorded at download time: sizes go in the local header
+                # and the file is copied without being checksummed again
+                crc, size = known
+                header = LOCAL_FILE_HEADER.pack(
+                    0x04034b50, ZIP_VERSION, flags, method, dos_time, dos_date,
+                    crc, size, size, len(name), 0
+                )
+                yield header + name
+                with open(path, "rb") as f:
+                    while True:
+                        chunk = f.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        yield chunk
+                length = len(header) + len(name) + size
+            else:
+                # Sizes and CRC are not known until the file has been read,
+                # so they follow the data in a data descriptor
+                flags |= FLAG_DATA_DESCRIPTOR
+                header = LOCAL_FILE_HEADER.pack(
+                    0x04034b50, ZIP_VERSION, flags, method, dos_time, dos_date,
+                    0, 0, 0, len(name), 0
+                )
+                yield header + name
+
+                crc = 0
+                size = 0
+                with open(path, "rb") as f:
+                    while True:
+                        chunk = f.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        crc = zlib.crc32(chunk, crc)
+                        size += len(chunk)
+                        yield chunk
+
+                yield DATA_DESCRIPTOR.pack(0x08074b50, crc, size, size)
+                length = len(header) + len(name) + size + DATA_DESCRIPTOR.size
+            compressed_size = size
+        else:
+            data, crc, size = deflated
+            method = ZIP_DEFLATED
+            compressed_size = len(data)
+            header = LOCAL_FILE_HEADER.pack(
+                0x04034b50, ZIP_VERSION, flags, method, dos_time, dos_date,
+                crc, compressed_size, size, len(name), 0
+            )
+            yield header + name
+            yield data
+            length = len(header) + len(name) + compressed_size
+
+        central_directory.append(
+            (name, flags, method, dos_time, dos_date, crc, compressed_size, size, offset)
+        )
+        offset += length
+
+    # The central directory is packed into one preallocated buffer and sent
+    # as a single chunk
+    cd_offset = offset
+    records = []
+    cd_size = 0
+    for name, flags, method, dos_time, dos_date, crc, compressed_size, size, header_offset in central_directory:
+        zip64 = header_offset >= ZIP64_LIMIT
+        records.append((name, flags, method, dos_time, dos_date, crc, compressed_size, size, header_offset, zip64))
+        cd_size += CENTRAL_DIRECTORY_HEADER.size + len(name) + (ZIP64_EXTRA.size if zip64 else 0)
+
+    buf = bytearray(cd_size)
+    pos = 0
+    for name, flags, method, dos_time, dos_date, crc, compressed_size, size, header_offset, zip64 in records:
+        version = ZIP64_VERSION if zip64 else ZIP_VERSION
+        CENTRAL_DIRECTORY_HEADER.pack_into(
+            buf, pos,
+            0x02014b50, version, version, flags, method, dos_time, dos_date,
+            crc, compressed_size, size, len(name), ZIP64_EXTRA.size if zip64 else 0,
+            0, 0, 0, 0, ZIP64_LIMIT if zip64 else header_offset
+        )
+        pos += CENTRAL_DIRECTORY_HEADER.size
+        buf[pos:pos + len(name)] = name
+        pos += len(name)
+        if zip64:
+            ZIP64_EXTRA.pack_into(buf, pos, 0x0001, 8, header_offset)
+            pos += ZIP64_EXTRA.size
+    if buf:
+        yield bytes(buf)
+
+    count = len(central_directory)
+    if count >= 0xFFFF or cd_size >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT:
+        zip64_eocd_offset = cd_offset + cd_size
+        yield ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+            0x06064b50, 44, ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+            count, count, cd_size, cd_offset
+        )
+        yield ZIP64_END_LOCATOR.pack(0x07064b50, 0, zip64_eocd_offset, 1)
+        count = min(count, 0xFFFF)
+        cd_size = min(cd_size, ZIP64_LIMIT)
+        cd_offset = min(cd_offset, ZIP64_LIMIT)
+
+    yield END_OF_CENTRAL_DIRECTORY.pack(
+        0x06054b50, 0, 0, count, count, cd_size, cd_offset, 0
+    )